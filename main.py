@@ -1,13 +1,23 @@
+import atexit
+import contextlib
 import getpass
+import hashlib
 import json
+import logging
+import mmap
 import os
 import pathlib
-import random
+import queue
 import re
 import secrets
 import string
 import threading
-from datetime import datetime
+import time
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library json is used without it
+    orjson = None
 
 from bankAccountExceptions import (
     AccountAlreadyExistsException,
@@ -19,42 +29,212 @@ from bankAccountExceptions import (
 SCRIPT_PATH = pathlib.Path(__file__).resolve().parent
 DATABASE_FILE_NAME = "database.json"
 DATABASE_PATH = pathlib.Path.joinpath(SCRIPT_PATH, DATABASE_FILE_NAME)
+JOURNAL_FILE_NAME = "database.jsonl"
+JOURNAL_PATH = pathlib.Path.joinpath(SCRIPT_PATH, JOURNAL_FILE_NAME)
+# Journal size in bytes after which it is compacted into database
+JOURNAL_MAX_SIZE = 10 * 1024 * 1024
+# Maximum number of pending write requests for the database writer thread
+WRITE_QUEUE_SIZE = 1024
+# Seconds to wait before writing again after writing to the database failed
+WRITE_RETRY_DELAY = 1.0
+# Format of created and modified dates stored with accounts
+DATE_FORMAT = "%d.%m.%Y %H:%M:%S"
+# Cost parameters of scrypt used to hash passwords
+PASSWORD_HASH_PARAMETERS = {"n": 2**14, "r": 8, "p": 1}
+PASSWORD_SALT_SIZE = 16
+# Password must contain at least 1 upper case, 1 digit and 1 special character
+PASSWORD_PATTERN = re.compile(
+    r"(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()_+=\[{\]};:<>|./?,-])"
+)
+# Character class flags used when validating many passwords at once
+PASSWORD_UPPER_CASE = 1
+PASSWORD_DIGIT = 2
+PASSWORD_SPECIAL = 4
+PASSWORD_ALL_CLASSES = PASSWORD_UPPER_CASE | PASSWORD_DIGIT | PASSWORD_SPECIAL
+# Lookup table of character class flags, characters not listed are checked for being digits
+PASSWORD_CHARACTER_CLASSES = {
+    **dict.fromkeys(string.ascii_lowercase + " ", 0),
+    **dict.fromkeys(string.ascii_uppercase, PASSWORD_UPPER_CASE),
+    **dict.fromkeys(string.digits, PASSWORD_DIGIT),
+    **dict.fromkeys("!@#$%^&*()_+=[{]};:<>|./?,-", PASSWORD_SPECIAL),
+}
+
+
+logger = logging.getLogger(__name__)
+
+
+def timestamp() -> str:
+    """Return current local time formatted for the database"""
+    return time.strftime(DATE_FORMAT, time.localtime())
+
+
+def json_loads(data):
+    """Parse JSON document from bytes-like object"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data))
+
+
+def json_dumps(data) -> bytes:
+    """Serialize data to JSON document encoded as bytes"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode("UTF-8")
+
+
+def hash_password(password: str, salt: bytes) -> bytes:
+    """Return scrypt hash of password with given salt"""
+    return hashlib.scrypt(
+        password.encode("UTF-8"), salt=salt, **PASSWORD_HASH_PARAMETERS
+    )
+
+
+def password_character_classes(password: str) -> int:
+    """
+    Return flags of character classes present in password, scanning it only once.
+    Used by BankAccount.validate_passwords, as it is faster than PASSWORD_PATTERN for long
+    passwords failing the check
+    """
+    flags = 0
+    for character in password:
+        flag = PASSWORD_CHARACTER_CLASSES.get(character, None)
+        if flag is None:
+            # Non ASCII decimal digits are digits as well, the same as \d in PASSWORD_PATTERN
+            flag = PASSWORD_DIGIT if character.isdecimal() else 0
+        flags |= flag
+        if flags == PASSWORD_ALL_CLASSES:
+            break
+    return flags
 
 
 class Database:
     """
     Singleton representation of JSON Database with context manager
     Allows to load all data from database.
-    Releasing all data within finish of context manager
+    Context manager holds the database lock, so data is not changed by other threads meanwhile
     """
 
     _instance = None
+    _lock = threading.RLock()  # Guards all data shared between accounts and threads
+    _account_locks = {}  # Locks serializing operations on a single account
 
     def __new__(cls):
         """Singleton representation in order to not create new instance of database"""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._load_data()
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._dirty = set()
+                cls._instance._write_lock = threading.RLock()
+                cls._instance._queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+                threading.Thread(target=cls._instance._writer_loop, daemon=True).start()
+                atexit.register(cls._instance.flush)
+                cls._instance._load_data()
         return cls._instance
 
     def __enter__(self):
-        """load data upon enter into context manager"""
+        """Acquire database lock and return data upon enter into context manager"""
+        self._lock.acquire()
         return self._data
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """release memory upon exit of context manager"""
-        pass
+        """Release database lock upon exit of context manager"""
+        self._lock.release()
 
     def _load_data(self):
         """Load all data from database"""
-        # Check if database file exists, if not -> create new one
-        if not os.path.exists(DATABASE_PATH):
-            with open(DATABASE_PATH, "w") as database:
-                json.dump({}, database)
-
-        # Load all data from database
-        with open(DATABASE_PATH, "r", encoding="UTF-8") as database:
-            self._data = json.load(database)
+        with self._lock:
+            # Open database file, if it doesn't exist -> create new one
+            try:
+                fd = os.open(DATABASE_PATH, os.O_RDONLY)
+            except FileNotFoundError:
+                try:
+                    fd = os.open(
+                        DATABASE_PATH, os.O_CREAT | os.O_WRONLY | os.O_EXCL, 0o600
+                    )
+                    try:
+                        os.write(fd, json_dumps({}))
+                    finally:
+                        os.close(fd)
+                except FileExistsError:
+                    pass  # Created by another process in the meantime
+                fd = os.open(DATABASE_PATH, os.O_RDONLY)
+
+            # Load all data from database, mapping the file instead of reading it into memory
+            with open(fd, "rb") as database:
+                if os.fstat(database.fileno()).st_size == 0:
+                    self._data = {}
+                else:
+                    with mmap.mmap(database.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        with memoryview(mm) as buffer:
+                            self._data = json_loads(buffer)
+
+            # Replay changes stored in the journal since the last compaction
+            for record in self._read_journal():
+                if record["op"] == "put":
+                    self._data[record["id"]] = record["account"]
+
+            # Bring accounts saved in older formats up to date and store them so at once
+            if self._migrate_accounts():
+                self.compact()
+
+            # Keep columns of account data in memory to answer queries without scanning accounts
+            self._account_numbers = set()
+            self._balances = {}
+            self._ssn_index = {}
+            for account_id, account in self._data.items():
+                self._index_account(account_id, account)
+
+    def _migrate_accounts(self) -> bool:
+        """Convert accounts saved in older formats, return True if any account was changed"""
+        migrated = False
+        for account in self._data.values():
+            # Accounts saved before balances were kept in cents store them as dollars in "balance"
+            if "balance_cents" not in account:
+                account["balance_cents"] = int(round(account.pop("balance", 0) * 100))
+                migrated = True
+            # Accounts created before passwords were hashed store them as plain text
+            if "password" in account:
+                salt = secrets.token_bytes(PASSWORD_SALT_SIZE)
+                account["password_salt"] = salt.hex()
+                account["password_hash"] = hash_password(
+                    account.pop("password"), salt
+                ).hex()
+                migrated = True
+        return migrated
+
+    def _read_journal(self) -> list:
+        """
+        Return all complete records from the journal.
+        Last record interrupted by a crash is dropped and cut off from the journal.
+        """
+        try:
+            with open(JOURNAL_PATH, "rb+") as journal:
+                content = journal.read()
+                lines = content.split(b"\n")
+                # Part after the last newline was not written completely
+                complete_size = len(content) - len(lines.pop())
+                records = []
+                for index, line in enumerate(lines):
+                    if not line.strip():
+                        continue
+                    try:
+                        records.append(json_loads(line))
+                    except ValueError:
+                        if index != len(lines) - 1:
+                            raise  # Damaged record in the middle of journal is not a crash
+                        complete_size -= len(line) + 1
+                if complete_size != len(content):
+                    journal.truncate(complete_size)
+                return records
+        except FileNotFoundError:
+            return []
+
+    def _index_account(self, account_id: str, account: dict):
+        """Add account to the in-memory columns and indexes"""
+        self._account_numbers.add(account.get("account_number", None))
+        self._balances[account_id] = account["balance_cents"]
+        if account.get("ssn", None):
+            self._ssn_index[account["ssn"]] = account_id
 
     def get_data(self):
         """Return all data from Bank database"""
@@ -66,21 +246,243 @@ class Database:
 
     def get_accounts_numbers(self):
         """Return all account numbers from database"""
-        return set(
-            account.get("Account number", None) for account in self._data.values()
-        )
-
-    def save_data(self, data: dict):
-        """Write data to the json database"""
-        with open(DATABASE_PATH, "w", encoding="UTF-8") as database_file:
-            json.dump(data, database_file)
+        return self._account_numbers
+
+    def get_account_id_by_ssn(self, ssn: str):
+        """Return account_id of account with given ssn or None"""
+        return self._ssn_index.get(ssn, None)
+
+    def get_total_balance(self) -> int:
+        """Return sum of balances of all accounts in cents"""
+        with self._lock:
+            return sum(self._balances.values())
+
+    def account_lock(self, account_id: str) -> threading.RLock:
+        """Return lock serializing operations on the given account"""
+        with self._lock:
+            lock = self._account_locks.get(account_id, None)
+            if lock is None:
+                lock = self._account_locks[account_id] = threading.RLock()
+            return lock
+
+    @contextlib.contextmanager
+    def lock_accounts(self, *account_ids: str):
+        """Lock given accounts always in the same order to prevent deadlocks between them"""
+        locks = [
+            self.account_lock(account_id) for account_id in sorted(set(account_ids))
+        ]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def add_account(self, account_id: str, account: dict):
+        """Add new account to the database"""
+        with self._lock:
+            self._data[account_id] = account
+            self._index_account(account_id, account)
+            self.mark_dirty(account_id)
+
+    def update_account(self, account_id: str, changes: dict):
+        """Update fields of existing account in the database"""
+        with self._lock:
+            account = self._data[account_id]
+            if "account_number" in changes:
+                self._account_numbers.discard(account.get("account_number", None))
+                self._account_numbers.add(changes["account_number"])
+            if "balance_cents" in changes:
+                self._balances[account_id] = changes["balance_cents"]
+            if "ssn" in changes and changes["ssn"] != account.get("ssn", None):
+                if self._ssn_index.get(account.get("ssn", None), None) == account_id:
+                    del self._ssn_index[account["ssn"]]
+                if changes["ssn"]:
+                    self._ssn_index[changes["ssn"]] = account_id
+            account.update(changes)
+            self.mark_dirty(account_id)
+
+    def make_deposit(self, account_id: str):
+        """
+        Return function depositing cents to the given account and returning new balance.
+        Account data is looked up once here instead of on every deposit.
+        """
+        lock = self._lock
+        account = self._data[account_id]
+        balances = self._balances
+        mark_dirty = self.mark_dirty
+
+        def deposit(cents: int) -> int:
+            with lock:
+                balance = account["balance_cents"] = account["balance_cents"] + cents
+                account["modified"] = timestamp()
+                balances[account_id] = balance
+                mark_dirty(account_id)
+            return balance
+
+        return deposit
+
+    def apply_batch(self, operations: list):
+        """
+        Apply list of (operation, account_id, cents) tuples and write them at once.
+        Supported operations: "deposit" of given integer number of cents
+        """
+        account_ids = [account_id for _, account_id, _ in operations]
+        with self.lock_accounts(*account_ids), self._lock:
+            # Validate whole batch first, so it is applied completely or not at all
+            for operation, account_id, cents in operations:
+                if operation != "deposit":
+                    raise ValueError(f"Unsupported operation: {operation}")
+                if account_id not in self._data:
+                    raise ValueError("Account doesn't exist")
+                if not isinstance(cents, int):
+                    raise TypeError("Value must be integer number of cents")
+                if cents <= 0:
+                    raise ValueError("Deposit value must be greater than zero")
+
+            modified = timestamp()
+            for _, account_id, cents in operations:
+                account = self._data[account_id]
+                account["balance_cents"] += cents
+                account["modified"] = modified
+                self._balances[account_id] = account["balance_cents"]
+                self.mark_dirty(account_id)
+
+        # Wait outside of the database lock, the writer thread needs it to take the changes
+        self.flush()
+
+    def mark_dirty(self, account_id: str):
+        """Schedule write of changed account by the writer thread"""
+        with self._lock:
+            # Writer is woken up only once, it takes all accounts changed until then at once
+            if not self._dirty:
+                try:
+                    self._queue.put_nowait(None)
+                except queue.Full:
+                    pass  # Writer has pending requests which will take this change too
+            self._dirty.add(account_id)
+
+    def flush(self):
+        """Write all pending changes to the database, raising OSError if it fails"""
+        self._write_journal()
+
+    def _writer_loop(self):
+        """Write changed accounts to the journal in background, one write per batch"""
+        while True:
+            self._queue.get()
+            # Coalesce all requests that arrived while the previous batch was written
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                self._write_journal()
+            except Exception:
+                # Changes are kept as dirty and written again by the next request
+                logger.exception("Writing to the database failed, retrying later")
+                time.sleep(WRITE_RETRY_DELAY)
+
+    def _write_journal(self):
+        """Append all changed accounts to the journal with a single write"""
+        with self._write_lock:
+            # Take snapshot of changed accounts, so file is written without the database lock
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                buffer = b"".join(
+                    json_dumps(
+                        {
+                            "op": "put",
+                            "id": account_id,
+                            "account": self._data[account_id],
+                        }
+                    )
+                    + b"\n"
+                    for account_id in dirty
+                )
+            if not buffer:
+                return
+            try:
+                fd = os.open(
+                    JOURNAL_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600
+                )
+                try:
+                    journal_size = os.fstat(fd).st_size
+                    try:
+                        # Write may be short e.g. on nearly full disk, write the rest again
+                        with memoryview(buffer) as remaining:
+                            while remaining:
+                                written = os.write(fd, remaining)
+                                if written == 0:
+                                    raise OSError("Journal write made no progress")
+                                remaining = remaining[written:]
+                        os.fsync(fd)
+                    except OSError:
+                        # Don't leave partial record that the next append would follow
+                        os.ftruncate(fd, journal_size)
+                        raise
+                    journal_size += len(buffer)
+                finally:
+                    os.close(fd)
+            except BaseException:
+                # Put changes back, so they are not lost and schedule another attempt
+                with self._lock:
+                    self._dirty |= dirty
+                    try:
+                        self._queue.put_nowait(None)
+                    except queue.Full:
+                        pass
+                raise
+
+            if journal_size > JOURNAL_MAX_SIZE:
+                try:
+                    self.compact()
+                except OSError:
+                    # Changes are already in the journal, compaction is tried after next write
+                    logger.exception("Compacting the database failed")
+
+    def compact(self):
+        """Write all data as a new database snapshot and truncate the journal"""
+        with self._write_lock:
+            with self._lock:
+                snapshot = json_dumps(self._data)
+            # Write to temporary file first, so the database is never left half written
+            temp_path = DATABASE_PATH.with_suffix(".json.tmp")
+            with open(temp_path, "wb") as database_file:
+                database_file.write(snapshot)
+                database_file.flush()
+                os.fsync(database_file.fileno())
+            os.replace(temp_path, DATABASE_PATH)
+            # Make the rename durable before the journal it replaces is emptied
+            fd = os.open(DATABASE_PATH.parent, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            open(JOURNAL_PATH, "w").close()
 
 
 class BankAccount:
+    # Fixed set of attributes, private names are mangled by Python the same way as in methods
+    __slots__ = (
+        "__account_id",
+        "__balance",
+        "__first_name",
+        "__last_name",
+        "__ssn",
+        "__account_number",
+        "__created",
+        "__modified",
+        "__is_logged",
+        "__deposit",
+        "database",
+    )
+
     def __init__(self, account_id: str = None):
         """Initialize all variables associated to specific bank account ID"""
         self.__account_id = account_id
-        self.__balance = 0  # Before logging the balance should be 0
+        self.__balance = 0  # Balance in cents. Before logging the balance should be 0
 
         self.__first_name = None
         self.__last_name = None
@@ -92,29 +494,38 @@ class BankAccount:
         self.__is_logged = False  # To perform transactions account must be logged with id and password to the bank account
 
         self.database = Database()  # Create an instance of connection to database
-        self.lock = (
-            threading.Lock()
-        )  # Lock will prevent to perform multiple operations in the same time that are not allowed
+        self.__deposit = None  # Deposit function bound to the account upon login
 
     def update_database(self):
-        """Update all account information to the Bank Database"""
-        with self.database:
-            data = self.database.get_data()
-            account = data[self.__account_id]
-            account["balance"] = self.__balance
-            account["first_name"] = self.__first_name
-            account["last_name"] = self.__last_name
-            account["account_number"] = self.__account_number
-            account["ssn"] = self.__ssn
-            account["modified"] = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
-            self.database.save_data(data)
+        """
+        Update account information to the Bank Database.
+        Balance is changed only by deposits, so it is read from the database instead of written
+        """
+        with self.database as data:
+            self.database.update_account(
+                self.__account_id,
+                {
+                    "first_name": self.__first_name,
+                    "last_name": self.__last_name,
+                    "account_number": self.__account_number,
+                    "ssn": self.__ssn,
+                    "modified": timestamp(),
+                },
+            )
+            self.__balance = data[self.__account_id]["balance_cents"]
 
     @property
     def is_logged(self) -> bool:
         return self.__is_logged
 
     @property
-    def balance(self) -> bool:
+    def balance(self) -> float:
+        """Balance in dollars, the same unit as deposits"""
+        return self.__balance / 100
+
+    @property
+    def balance_cents(self) -> int:
+        """Balance in cents, as it is stored"""
         return self.__balance
 
     @property
@@ -123,8 +534,8 @@ class BankAccount:
 
     def login(self, account_id: str) -> None:
         """Login to the BankAccount with the given credentials of id and password"""
-        with self.database:
-            account = self.database.get_data().get(account_id, None)
+        with self.database as data:
+            account = data.get(account_id, None)
 
         # Check if given accound_id is in database
         if account is None:
@@ -132,7 +543,10 @@ class BankAccount:
 
         # Check if user input for password is the same as in database for specific account id
         password = getpass.getpass()
-        if not secrets.compare_digest(account["password"], password):
+        password_hash = hash_password(password, bytes.fromhex(account["password_salt"]))
+        if not secrets.compare_digest(
+            bytes.fromhex(account["password_hash"]), password_hash
+        ):
             raise InvalidPasswordException
 
         # If credentials are valid then assign all instance variables from the database
@@ -140,25 +554,24 @@ class BankAccount:
         self.__first_name = account["first_name"]
         self.__last_name = account["last_name"]
         self.__ssn = account["ssn"]
-        self.__balance = account["balance"]
+        self.__balance = account["balance_cents"]
         self.__account_number = account["account_number"]
+        self.__deposit = self.database.make_deposit(account_id)
         self.__is_logged = True
         print("\n>>> BANK >>>>>>>>>>>>>>>>>>>>>>")
         print(f"Welcome {self.first_name}, you are now logged in.")
-        print(f"Your balance is: ${self.balance}")
+        print(f"Your balance is: ${self.balance:.2f}")
         print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>\n")
 
     @staticmethod
     def is_password_validated(password1: str, password2=None) -> bool:
         """Function that check if user input for password fulfill all conditions. If the second argument is given then it check if both inputs are exactly the same"""
-        PATTERN = r"(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()_+=\[{\]};:<>|./?,-])"
-
         # Check all conditions for the first input of password
         if password2 is None:
             if not len(password1) > 7:
                 print("Password must be greater or eqaul to 8 characters")
                 return False
-            if not re.search(PATTERN, password1):
+            if not PASSWORD_PATTERN.search(password1):
                 print(
                     "Password must contain at least 1 upper case, 1 digit and 1 special character"
                 )
@@ -171,6 +584,18 @@ class BankAccount:
                 return False
         return True
 
+    @staticmethod
+    def validate_passwords(passwords: list) -> list:
+        """
+        Check many passwords at once, e.g. when importing accounts, without printing messages.
+        Return list of booleans telling which passwords fulfill all conditions
+        """
+        return [
+            len(password) > 7
+            and password_character_classes(password) == PASSWORD_ALL_CLASSES
+            for password in passwords
+        ]
+
     def create(self) -> None:
         # Check if account is already logged. If it is logged, forbid the creating new account
         if self.is_logged:
@@ -178,10 +603,9 @@ class BankAccount:
 
         account_id = input("Account ID: ")  # Ask user for account id (login)
 
-        # Check if id already in database
-        with self.database:
-            if account_id in self.database.get_accounts_ids():
-                raise AccountAlreadyExistsException
+        # Check if id already in database before asking for the rest of data
+        if account_id in self.database.get_accounts_ids():
+            raise AccountAlreadyExistsException
 
         # Ask and validate password
         password = getpass.getpass()
@@ -191,58 +615,77 @@ class BankAccount:
         while not self.is_password_validated(password, password_again):
             password_again = getpass.getpass("Repeat password: ")
 
-        # Generate account number
-        account_number = None
-        with self.database:
-            while (
-                account_number is None
-                or account_number in self.database.get_accounts_numbers()
-            ):
-                account_number = "7810106666" + "".join(
-                    random.choices(string.digits, k=16)
-                )
-
         ######################
         # TODO: get all data like first name, last name, ssn
         ######################
 
-        # Collect all data into dictionary
-        new_account = {
-            "password": password,
-            "balance": 0,
-            "account_number": account_number,
-            "first_name": "",
-            "last_name": "",
-            "ssn": "",
-            "created": datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
-        }
-
-        # Open database connection and add new account
-        with self.database:
-            data = self.database.get_data()
-            data[account_id] = new_account
-            self.database.save_data(data)
+        # Password is stored only as salted hash, computed before locking the database as it is slow
+        salt = secrets.token_bytes(PASSWORD_SALT_SIZE)
+        password_hash = hash_password(password, salt)
+
+        # Open database connection once to check id again, generate account number and add new account
+        with self.database as data:
+            if account_id in data:
+                raise AccountAlreadyExistsException
+
+            accounts_numbers = self.database.get_accounts_numbers()
+            account_number = None
+            while account_number is None or account_number in accounts_numbers:
+                account_number = f"7810106666{secrets.randbelow(10**16):016d}"
+
+            # Collect all data into dictionary
+            new_account = {
+                "password_salt": salt.hex(),
+                "password_hash": password_hash.hex(),
+                "balance_cents": 0,
+                "account_number": account_number,
+                "first_name": "",
+                "last_name": "",
+                "ssn": "",
+                "created": timestamp(),
+            }
+            self.database.add_account(account_id, new_account)
         print("Account created successfully!")
 
+    def deposit_many(self, values: list) -> None:
+        """Deposit all given values with a single write to the database"""
+        if not self.is_logged:
+            raise AccountNotLoggedException
+
+        operations = []
+        for value in values:
+            if not isinstance(value, (int, float)):
+                raise TypeError("Value must be decimal")
+            cents = int(round(value * 100))
+            if cents <= 0:
+                raise ValueError("Deposit value must be greater than zero")
+            operations.append(("deposit", self.__account_id, cents))
+
+        with self.database.lock_accounts(self.__account_id):
+            self.database.apply_batch(operations)
+            with self.database as data:
+                self.__balance = data[self.__account_id]["balance_cents"]
+
     def deposit(self, value: float) -> None:
         # Check if deposit value is valid
         if not self.is_logged:
             raise AccountNotLoggedException
         if not isinstance(value, (int, float)):
             raise TypeError("Value must be decimal")
-        if value <= 0:
+        # Store money as integer cents to avoid floating point rounding errors
+        cents = int(round(value * 100))
+        if cents <= 0:
             raise ValueError("Deposit value must be greater than zero")
 
         # Perform deposit and update the database
-        with self.lock:
-            self.__balance += value
-            self.update_database()
+        with self.database.lock_accounts(self.__account_id):
+            self.__balance = self.__deposit(cents)
 
 
 if __name__ == "__main__":
     my_account = BankAccount()
     # my_account.create()
     my_account.login(id="999")
-    print(my_account.balance)
+    print(f"${my_account.balance:.2f}")
     my_account.deposit(50)
-    print(my_account.balance)
+    print(f"${my_account.balance:.2f}")